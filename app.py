@@ -1,62 +1,272 @@
 import streamlit as st
-import pandas as pd
 from datetime import datetime
-import json
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+import orjson
+import heapq
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 
 # --- CONFIGURATION ---
 ROOMIES = ["Ale", "Ferb", "Fandi"]
 CATS_PARENTS = ["Ale", "Fandi"]
 SHEET_NAME = "RoomieData" # Make sure this matches your Sheet Name exactly
+TASK_STATUSES = ("Pendiente", "En Progreso", "Completado")
+TASK_STATUS_IDX = {s: i for i, s in enumerate(TASK_STATUSES)} # status -> selectbox index
+
+# Each section lives in its own worksheet (tab) named after it, with these columns.
+# Row 1 is the header; list columns are stored as JSON text. Missing tabs are
+# created on first load, importing the old JSON blob from the first sheet's A1.
+SHEET_COLUMNS = {
+    "tasks": ["id", "title", "assignees", "status", "importance", "created", "due", "context"],
+    "bills": ["date", "amount_cents", "category", "description", "payer", "debtors", "context"],
+    "shopping": ["id", "name", "status", "context"],
+    "furniture": ["name", "estimate", "date", "status", "context"],
+}
+LIST_COLUMNS = {"assignees", "debtors"}
+SETTLED_CENTS = 100 # Transfers under $1 are not suggested (splits leave cent residuals)
+GRID_HEADROOM = 1000 # Spare rows added whenever a tab is created or grown
+RETRY_STATUSES = {429, 500, 502, 503, 504} # Rate limit and transient server errors
 
 # --- GOOGLE SHEETS CONNECTION ---
+# The authorized client is cached per process (ttl stays under the 1h token lifetime)
+@st.cache_resource(ttl=3000)
 def get_google_sheet_client():
+    # Heavy imports are deferred until a Sheets client is actually needed
+    import gspread
+    from google.oauth2.service_account import Credentials
+
     # We will load credentials from Streamlit Secrets (Step 4)
     scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
     creds_dict = dict(st.secrets["gcp_service_account"])
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
+    creds = Credentials.from_service_account_info(creds_dict, scopes=scope)
     client = gspread.authorize(creds)
     return client
 
+@st.cache_resource(ttl=3000)
+def get_spreadsheet():
+    # Opening the spreadsheet is a separate Drive API call, so cache it too
+    return get_google_sheet_client().open(SHEET_NAME)
+
+def add_section_worksheet(spreadsheet, section, n_rows):
+    # Sized for the rows it will hold plus headroom; write_rows grows it later
+    return spreadsheet.add_worksheet(title=section, rows=n_rows + GRID_HEADROOM, cols=len(SHEET_COLUMNS[section]))
+
+@st.cache_resource(ttl=3000)
+def get_worksheet(section):
+    return get_spreadsheet().worksheet(section)
+
+def with_retries(call, attempts=3):
+    # Retry transient Sheets API errors with exponential backoff (0.5s, 1s, ...)
+    from gspread.exceptions import APIError
+
+    for attempt in range(attempts):
+        try:
+            return call()
+        except APIError as e:
+            if attempt == attempts - 1 or e.response.status_code not in RETRY_STATUSES:
+                raise
+            time.sleep(0.5 * 2 ** attempt)
+
+@st.cache_resource
+def get_executor():
+    # Sheets writes run here so reruns don't wait on the network
+    return ThreadPoolExecutor(max_workers=2)
+
 # --- DATA MANAGEMENT (CLOUD VERSION) ---
+def to_cents(amount):
+    # Money is stored and split as integer cents, so balances add up exactly
+    return int(round(amount * 100))
+
+def to_rows(section, records):
+    # Records -> sheet rows (header first), in the same shape load_data returns
+    cols = SHEET_COLUMNS[section]
+    rows = [cols]
+    for r in records:
+        rows.append([orjson.dumps(r.get(c, [])).decode() if c in LIST_COLUMNS else r.get(c, "") for c in cols])
+    return rows
+
+def from_rows(section, rows):
+    # Sheet rows -> records (skips the header row)
+    cols = SHEET_COLUMNS[section]
+    records = []
+    for row in rows[1:]:
+        if not any(cell != "" for cell in row):
+            # Blank rows (e.g. cleared by hand) are not records; the next save compacts them
+            continue
+        record = dict(zip(cols, row))
+        for c in LIST_COLUMNS.intersection(cols):
+            record[c] = orjson.loads(record[c]) if record[c] else []
+        records.append(record)
+    return records
+
+def read_legacy_data(spreadsheet):
+    # Before the per-section tabs, the whole data dict was a JSON blob in sheet1!A1
+    raw = spreadsheet.sheet1.acell("A1").value
+    if not raw or not raw.startswith("{"):
+        return {}
+    try:
+        data = orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        return {}
+
+    # Bring old records up to the current schema
+    stamp = datetime.now().timestamp()
+    for n, item in enumerate(data.get("shopping", [])):
+        if not item.get("id"):
+            item["id"] = f"{stamp}-{n}"
+    for bill in data.get("bills", []):
+        if "amount_cents" not in bill:
+            bill["amount_cents"] = to_cents(bill.pop("amount", 0) or 0)
+    return data
+
+@st.cache_resource
+def ensure_worksheets():
+    # Create any missing section tab with its header row. On the first run this
+    # also imports the legacy blob, so existing deployments keep their data.
+    # Cached, so the metadata call happens once per process, not on every load.
+    spreadsheet = get_spreadsheet()
+    existing = {ws.title for ws in spreadsheet.worksheets()}
+    missing = [section for section in SHEET_COLUMNS if section not in existing]
+    if not missing:
+        return
+    legacy = read_legacy_data(spreadsheet)
+    for section in missing:
+        rows = to_rows(section, legacy.get(section, []))
+        ws = add_section_worksheet(spreadsheet, section, len(rows))
+        ws.update(range_name="A1", values=rows, value_input_option="RAW")
+
+# Reads are cached for a minute and shared across sessions; save_data clears it.
+# Errors are raised (not returned) so a failed read is never cached.
+@st.cache_data(ttl=60)
 def load_data():
+    spreadsheet = get_spreadsheet()
+    ensure_worksheets()
+    # A single batchGet call reads every section. A bare tab title means its whole
+    # grid, so the read never exceeds the grid limits however long a tab gets.
+    ranges = list(SHEET_COLUMNS)
+    resp = with_retries(lambda: spreadsheet.values_batch_get(ranges, params={"valueRenderOption": "UNFORMATTED_VALUE"}))
+    sheets = {}
+    for section, value_range in zip(SHEET_COLUMNS, resp["valueRanges"]):
+        width = len(SHEET_COLUMNS[section])
+        # The API omits trailing empty cells, so pad every row to the full width
+        sheets[section] = [(row + [""] * width)[:width] for row in value_range.get("values", [])]
+    return sheets
+
+def write_rows(ws, rows, saved):
+    # Send only the delta between the new rows and what the sheet already holds
+    if saved is None:
+        # Sheet contents are unknown (a background write failed part-way), so overwrite it
+        ws.clear()
+        saved = []
+    if len(rows) > ws.row_count:
+        # Explicit-range writes don't grow the grid the way append_rows did.
+        # resize sets an absolute size, so a retried call is harmless.
+        ws.resize(rows=len(rows) + GRID_HEADROOM)
+    if rows[:len(saved)] == saved:
+        # Append-only change (new task, bill, item...). Written to an explicit
+        # range rather than append_rows, so a retried request can't duplicate rows.
+        ws.update(range_name=f"A{len(saved) + 1}", values=rows[len(saved):], value_input_option="RAW")
+        return
+
+    last_col = chr(ord("A") + len(rows[0]) - 1)
+    changed = [
+        {"range": f"A{i + 1}:{last_col}{i + 1}", "values": [row]}
+        for i, row in enumerate(rows) if i >= len(saved) or row != saved[i]
+    ]
+    if changed:
+        ws.batch_update(changed, value_input_option="RAW")
+    if len(saved) > len(rows):
+        # Rows were removed, blank out the leftover tail
+        ws.batch_clear([f"A{len(rows) + 1}:{last_col}{len(saved)}"])
+
+def data_hash(data):
+    # Content fingerprint of the whole data dict, to skip no-op saves
+    return hashlib.blake2b(orjson.dumps(data), digest_size=16).digest()
+
+def write_sections(changes):
+    # Runs on the executor thread, so only gspread calls here (no session state)
+    for ws, rows, saved in changes:
+        with_retries(lambda: write_rows(ws, rows, saved))
+    # The cached copy is stale now
+    load_data.clear()
+
+def finish_pending_save(timeout=0):
+    # Collect the last background save. timeout=0 only checks, None waits for it.
+    # Returns False if the save failed or is still running.
+    future = st.session_state.get('save_future')
+    if future is None:
+        return True
     try:
-        client = get_google_sheet_client()
-        sheet = client.open(SHEET_NAME).sheet1
-        # We read the data from cell A1 where we store the big JSON
-        data_raw = sheet.cell(1, 1).value
-        
-        if not data_raw:
-            # If cell is empty, return default structure
-            return {
-                "tasks": [],
-                "bills": [],
-                "shopping": [],
-                "furniture": []
-            }
-        return json.loads(data_raw)
+        future.result(timeout=timeout)
+    except FutureTimeout:
+        if timeout:
+            st.warning("El guardado está tardando más de lo normal, sigue en segundo plano.")
+        return False
     except Exception as e:
-        st.error(f"Error loading data: {e}")
-        return {"tasks": [], "bills": [], "shopping": [], "furniture": []}
+        st.error(f"Error saving data: {e}")
+        # A cached Worksheet may be stale (e.g. the tab was deleted), so look it up again
+        get_worksheet.clear()
+        # Part of the write may have landed, so resend every section on the next save
+        st.session_state.saved_rows = {section: None for section in SHEET_COLUMNS}
+        st.session_state.last_saved_hash = None
+        st.session_state.dirty = True
+        del st.session_state.save_future
+        return False
+    del st.session_state.save_future
+    return True
 
-def save_data(data):
+def save_data(data, wait=False):
+    # Fire-and-forget by default; wait=True blocks (up to 5s) until the write lands
     try:
-        client = get_google_sheet_client()
-        sheet = client.open(SHEET_NAME).sheet1
-        # Convert the whole data object to a string and save in Cell A1
-        # This is a simple hack to keep your data structure without complex SQL
-        json_str = json.dumps(data)
-        sheet.update_cell(1, 1, json_str) 
+        # Each diff assumes the previous write already happened
+        finish_pending_save(timeout=None)
+        h = data_hash(data)
+        if h == st.session_state.last_saved_hash:
+            # Nothing changed since the last save, skip the round-trip
+            st.session_state.dirty = False
+            return True
+        changes = {}
+        for section in SHEET_COLUMNS:
+            rows = to_rows(section, data[section])
+            if rows != st.session_state.saved_rows[section]:
+                changes[section] = (get_worksheet(section), rows, st.session_state.saved_rows[section])
+        st.session_state.save_future = get_executor().submit(write_sections, list(changes.values()))
+        # Only now is every change queued, so record what the sheet will hold
+        for section, (_, rows, _) in changes.items():
+            st.session_state.saved_rows[section] = rows
+        st.session_state.last_saved_hash = h
+        # This session already holds the saved dict
+        st.session_state.data = data
+        st.session_state.dirty = False
     except Exception as e:
         st.error(f"Error saving data: {e}")
+        get_worksheet.clear()
+        # Keep the changes flagged so the next rerun retries them
+        st.session_state.dirty = True
+        return False
+    return finish_pending_save(timeout=5) if wait else True
 
 # Initialize Session State
 if 'data' not in st.session_state:
-    st.session_state.data = load_data()
+    try:
+        sheets = load_data()
+    except Exception as e:
+        # Don't run the app on empty data: a save would overwrite what's in the sheet.
+        # 'data' stays unset, so the load is retried on the next rerun.
+        st.error(f"Error loading data: {e}")
+        st.button("Reintentar")
+        st.stop()
+    st.session_state.saved_rows = sheets # What the sheet holds, to diff against on save
+    st.session_state.data = {section: from_rows(section, rows) for section, rows in sheets.items()}
+    st.session_state.last_saved_hash = data_hash(st.session_state.data)
+if 'dirty' not in st.session_state:
+    st.session_state.dirty = False # True when data has unsaved changes
 if 'shopping_cart' not in st.session_state:
     st.session_state.shopping_cart = {} # {item_name: price}
 
+# Report a background save that failed since the last rerun
+finish_pending_save()
+
 # --- SIDEBAR & CONTEXT ---
 st.sidebar.title("🏠 Menu")
 mode = st.sidebar.radio("Sección", ["Resumen", "Responsabilidades", "Cuentas (Bills)", "Lista de Compras", "Muebles"])
@@ -73,32 +283,74 @@ context_id = "cat" if is_cat_mode else "house"
 def get_context_data(key):
     return [x for x in st.session_state.data[key] if x.get('context') == context_id]
 
+# Context views are built once per rerun. They hold the same dicts as
+# st.session_state.data, so edits made through them are saved.
+ctx = {key: get_context_data(key) for key in SHEET_COLUMNS}
+shopping_by_status = {'buy': [], 'have': []}
+for i in ctx['shopping']:
+    # Rows with an unknown status (e.g. a hand-edited cell) are left out, as before
+    if i['status'] in shopping_by_status:
+        shopping_by_status[i['status']].append(i)
+shopping_names = {i['name']: i for i in ctx['shopping']}
+
 # --- LOGIC: DEBT CALCULATION ---
 def calculate_debts(bills_list):
-    # Matrix: Who owes Who how much
-    balances = {u: 0 for u in current_users} 
-    details = []
-    
-    for bill in bills_list:
-        payer = bill['payer']
-        debtors = bill['debtors']
-        amount = bill['amount']
-        
-        if not debtors: continue
-        
-        split_amount = amount / len(debtors)
-        
-        # Payer "gains" the amount (because they paid)
-        # But if payer is in debtors, they essentially pay themselves back that portion
-        
-        for d in debtors:
-            if d != payer:
-                # Debtor loses money (owes), Payer gains
-                # We track net balance. + means you are owed money, - means you owe.
-                balances[d] -= split_amount
-                balances[payer] += split_amount
+    # Net balance per person in cents. + means you are owed money, - means you owe.
+    import pandas as pd
+
+    df = pd.DataFrame(bills_list, columns=['payer', 'debtors', 'amount_cents'])
+    df = df[df['debtors'].str.len() > 0]
+    if df.empty:
+        return {u: 0 for u in current_users}
+
+    # Integer split: everyone gets q cents and the first r debtors one cent more
+    n = df['debtors'].str.len()
+    df = df.assign(q=df['amount_cents'] // n, r=df['amount_cents'] % n)
+    # One row per (bill, debtor) with that debtor's share
+    shares = df.explode('debtors').rename(columns={'debtors': 'debtor'})
+    position = shares.groupby(level=0).cumcount()
+    shares = shares.assign(split=shares['q'] + (position < shares['r']))
+    # If payer is in debtors, they essentially pay themselves back that portion
+    shares = shares[shares['debtor'] != shares['payer']]
+
+    owed = shares.groupby('debtor')['split'].sum()
+    received = shares.groupby('payer')['split'].sum()
+    balances = received.sub(owed, fill_value=0).reindex(current_users, fill_value=0)
+    return balances.astype(int).to_dict()
+
+def simplify_debts(balances):
+    # Minimum set of transfers that settles all balances: repeatedly pair the
+    # biggest creditor with the biggest debtor. Returns [(debtor, creditor, amount)].
+    # Balances are paired exactly; only transfers under SETTLED_CENTS are dropped.
+    # heapq is a min-heap, so amounts are pushed negated.
+    creditors = [(-amt, p) for p, amt in balances.items() if amt > 0]
+    debtors = [(amt, p) for p, amt in balances.items() if amt < 0]
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+
+    transfers = []
+    while creditors and debtors:
+        credit, creditor = heapq.heappop(creditors)
+        debt, debtor = heapq.heappop(debtors)
+        amount = min(-credit, -debt)
+        if amount >= SETTLED_CENTS:
+            transfers.append((debtor, creditor, amount))
+        # Push back whatever is left over on either side
+        if -credit > amount:
+            heapq.heappush(creditors, (credit + amount, creditor))
+        if -debt > amount:
+            heapq.heappush(debtors, (debt + amount, debtor))
+    return sorted(transfers, key=lambda t: t[2], reverse=True)
+
+# The cache is shared by all sessions, so it is keyed on the bills' content hash.
+# The leading underscore keeps Streamlit from hashing the list itself.
+@st.cache_data(max_entries=20)
+def bills_df(_bills, bills_hash):
+    import pandas as pd
 
-    return balances
+    df = pd.DataFrame(_bills)
+    df['amount'] = df['amount_cents'] / 100
+    return df[['date', 'description', 'amount', 'payer', 'category']]
 
 # --- SECTIONS ---
 
@@ -106,20 +358,36 @@ def calculate_debts(bills_list):
 if mode == "Resumen":
     st.title(f"{'🐱' if is_cat_mode else '🏠'} Resumen General")
     
-    # Calculate Debts
-    bills = get_context_data('bills')
-    balances = calculate_debts(bills)
+    # Calculate Debts (only when a bill was added or the context changed)
+    bills = ctx['bills']
+    bal_key = (context_id, len(bills))
+    if st.session_state.get('bal_key') != bal_key:
+        st.session_state.balances = calculate_debts(bills)
+        st.session_state.bal_key = bal_key
+    balances = st.session_state.balances
     
     st.subheader("Balances (Quién debe a quién)")
     
-    # Logic to simplify debts
-    for person, amount in balances.items():
-        if amount > 1:
-            st.success(f"{person} recupera: ${amount:,.0f}")
-        elif amount < -1:
-            st.error(f"{person} debe: ${abs(amount):,.0f}")
+    # Logic to simplify debts. The balances shown are the net of the suggested
+    # transfers, so both lists agree on who is settled.
+    transfers = simplify_debts(balances)
+    pending = {person: 0 for person in balances}
+    for debtor, creditor, amount in transfers:
+        pending[debtor] -= amount
+        pending[creditor] += amount
+    for person, amount in pending.items():
+        if amount > 0:
+            st.success(f"{person} recupera: ${amount / 100:,.0f}")
+        elif amount < 0:
+            st.error(f"{person} debe: ${abs(amount) / 100:,.0f}")
         else:
             st.info(f"{person} está a paz y salvo.")
+
+    st.subheader("Pagos sugeridos")
+    if not transfers:
+        st.info("No hay pagos pendientes.")
+    for debtor, creditor, amount in transfers:
+        st.markdown(f"**{debtor}** → **{creditor}**: ${amount / 100:,.0f}")
             
     if st.button("Settle Up / Marcar Pagos"):
         st.info("Para marcar pagos, agrega una 'Cuenta' nueva donde el que debe paga al que le deben con categoría 'Pago Deuda'.")
@@ -130,7 +398,7 @@ elif mode == "Responsabilidades":
     
     tab1, tab2 = st.tabs(["Mis Tareas", "Tablero General"])
     
-    all_tasks = get_context_data('tasks')
+    all_tasks = ctx['tasks']
     
     with tab2: # Create and View All
         st.subheader("Nueva Tarea")
@@ -151,7 +419,7 @@ elif mode == "Responsabilidades":
                     "context": context_id
                 }
                 st.session_state.data['tasks'].append(new_task)
-                save_data(st.session_state.data)
+                st.session_state.dirty = True
                 st.rerun()
 
         st.markdown("---")
@@ -162,11 +430,11 @@ elif mode == "Responsabilidades":
             status_color = "🔴" if t['status'] == "Pendiente" else "🟡" if t['status'] == "En Progreso" else "🟢"
             col1.caption(f"Imp: {t['importance']} | Vence: {t['due']}")
             
-            new_status = col2.selectbox("", ["Pendiente", "En Progreso", "Completado"], key=f"s_{t['id']}", index=["Pendiente", "En Progreso", "Completado"].index(t['status']), label_visibility="collapsed")
+            new_status = col2.selectbox("", TASK_STATUSES, key=f"s_{t['id']}", index=TASK_STATUS_IDX[t['status']], label_visibility="collapsed")
             
             if new_status != t['status']:
                 t['status'] = new_status
-                save_data(st.session_state.data)
+                st.session_state.dirty = True
                 st.rerun()
 
     with tab1: # Personal
@@ -194,7 +462,7 @@ elif mode == "Cuentas (Bills)":
             if st.form_submit_button("Guardar Gasto"):
                 new_bill = {
                     "date": str(b_date),
-                    "amount": b_amount,
+                    "amount_cents": to_cents(b_amount),
                     "category": b_cat,
                     "description": b_desc,
                     "payer": b_payer,
@@ -202,15 +470,15 @@ elif mode == "Cuentas (Bills)":
                     "context": context_id
                 }
                 st.session_state.data['bills'].append(new_bill)
-                save_data(st.session_state.data)
+                st.session_state.dirty = True
                 st.success("Guardado")
                 st.rerun()
     
     # History
-    bills = get_context_data('bills')
+    bills = ctx['bills']
     if bills:
-        df = pd.DataFrame(bills)
-        st.dataframe(df[['date', 'description', 'amount', 'payer', 'category']], use_container_width=True)
+        df = bills_df(bills, data_hash(bills))
+        st.dataframe(df, use_container_width=True)
     else:
         st.info("No hay gastos registrados aún.")
 
@@ -219,9 +487,8 @@ elif mode == "Lista de Compras":
     st.title("🛒 Supermercado")
     
     # Separate Items into "To Buy" and "In Inventory"
-    all_items = get_context_data('shopping')
-    to_buy = [i for i in all_items if i['status'] == 'buy']
-    have = [i for i in all_items if i['status'] == 'have']
+    to_buy = shopping_by_status['buy']
+    have = shopping_by_status['have']
     
     # MODE SELECTION
     shopping_mode = st.toggle("Modo: Ir de Compras (En el super)")
@@ -233,27 +500,35 @@ elif mode == "Lista de Compras":
             st.subheader("📝 Falta Comprar")
             new_item = st.text_input("Agregar item (+ Enter)")
             if new_item:
-                if not any(i['name'] == new_item for i in all_items):
-                    st.session_state.data['shopping'].append({"name": new_item, "status": "buy", "context": context_id})
-                    save_data(st.session_state.data)
+                if new_item not in shopping_names:
+                    st.session_state.data['shopping'].append({"id": str(datetime.now().timestamp()), "name": new_item, "status": "buy", "context": context_id})
+                    st.session_state.dirty = True
                     st.rerun()
             
-            for item in to_buy:
-                if st.button(f"✅ Ya tenemos: {item['name']}", key=f"have_{item['name']}"):
-                    item['status'] = 'have'
-                    save_data(st.session_state.data)
-                    st.rerun()
-                if st.button(f"🗑️ Eliminar: {item['name']}", key=f"del_{item['name']}"):
-                    st.session_state.data['shopping'].remove(item)
-                    save_data(st.session_state.data)
-                    st.rerun()
+            if to_buy:
+                # Tick several items and apply them with a single submit
+                with st.form("bulk_shop"):
+                    have_flags, del_flags = [], []
+                    for item in to_buy:
+                        have_flags.append(st.checkbox(f"✅ Ya tenemos: {item['name']}", key=f"have_{item['id']}"))
+                        del_flags.append(st.checkbox(f"🗑️ Eliminar: {item['name']}", key=f"del_{item['id']}"))
+
+                    if st.form_submit_button("Aplicar"):
+                        for item, got_it, delete in zip(to_buy, have_flags, del_flags):
+                            if delete:
+                                st.session_state.data['shopping'].remove(item)
+                            elif got_it:
+                                item['status'] = 'have'
+                        if any(have_flags) or any(del_flags):
+                            st.session_state.dirty = True
+                            st.rerun()
 
         with col2:
             st.subheader("🏠 En Casa")
             for item in have:
-                if st.button(f"🔙 Se acabó: {item['name']}", key=f"buy_{item['name']}"):
+                if st.button(f"🔙 Se acabó: {item['name']}", key=f"buy_{item['id']}"):
                     item['status'] = 'buy'
-                    save_data(st.session_state.data)
+                    st.session_state.dirty = True
                     st.rerun()
     
     else:
@@ -262,23 +537,34 @@ elif mode == "Lista de Compras":
         
         # 1. Select items from "To Buy" list to add to cart
         st.subheader("Lista de Pendientes")
-        for item in to_buy:
-            # If item is already in cart, show it differently
-            in_cart = item['name'] in st.session_state.shopping_cart
-            
-            col_a, col_b = st.columns([3, 2])
-            if in_cart:
-                col_a.success(f"🛒 {item['name']}")
-                price = col_b.number_input(f"Valor {item['name']}", value=st.session_state.shopping_cart[item['name']], key=f"price_{item['name']}")
-                st.session_state.shopping_cart[item['name']] = price
-                if col_b.button("Sacar", key=f"rem_{item['name']}"):
-                    del st.session_state.shopping_cart[item['name']]
-                    st.rerun()
-            else:
-                col_a.write(item['name'])
-                if col_b.button("Al carro", key=f"add_{item['name']}"):
-                    st.session_state.shopping_cart[item['name']] = 0 # Init price
-                    st.rerun()
+        import pandas as pd
+
+        # One editable grid for the whole cart; edits are applied together on submit
+        cart = st.session_state.shopping_cart
+        cart_df = pd.DataFrame(
+            [{"item": n, "price": p, "in_cart": True} for n, p in cart.items()]
+            + [{"item": i['name'], "price": 0, "in_cart": False} for i in to_buy if i['name'] not in cart],
+            columns=["item", "price", "in_cart"],
+        )
+        with st.form("cart"):
+            edited = st.data_editor(
+                cart_df,
+                num_rows="fixed",
+                hide_index=True,
+                use_container_width=True,
+                disabled=["item"],
+                column_config={
+                    "item": st.column_config.TextColumn("Item"),
+                    "price": st.column_config.NumberColumn("Valor", min_value=0, step=100),
+                    "in_cart": st.column_config.CheckboxColumn("🛒 Al carro"),
+                },
+            )
+            if st.form_submit_button("Actualizar carrito"):
+                st.session_state.shopping_cart = {
+                    row["item"]: row["price"] if pd.notna(row["price"]) else 0
+                    for row in edited.to_dict("records") if row["in_cart"]
+                }
+                st.rerun()
 
         # 2. Checkout
         st.markdown("---")
@@ -302,7 +588,7 @@ elif mode == "Lista de Compras":
                     # 2. Add to Bills
                     new_bill = {
                         "date": str(datetime.now().date()),
-                        "amount": cart_total,
+                        "amount_cents": to_cents(cart_total),
                         "category": "Supermercado",
                         "description": desc_str,
                         "payer": c_payer,
@@ -313,17 +599,15 @@ elif mode == "Lista de Compras":
                     
                     # 3. Update Inventory (Mark bought items as 'have')
                     for item_name in cart_items:
-                        # Find item in data
-                        for db_item in st.session_state.data['shopping']:
-                            if db_item['name'] == item_name and db_item['context'] == context_id:
-                                db_item['status'] = 'have'
+                        if item_name in shopping_names:
+                            shopping_names[item_name]['status'] = 'have'
                     
-                    # 4. Clear Cart and Save
+                    # 4. Clear Cart and Save (waits for the write, unlike other edits)
                     st.session_state.shopping_cart = {}
-                    save_data(st.session_state.data)
-                    st.balloons()
-                    st.success("Compra registrada y gastos divididos.")
-                    st.rerun()
+                    if save_data(st.session_state.data, wait=True):
+                        st.balloons()
+                        st.success("Compra registrada y gastos divididos.")
+                        st.rerun()
 
 # 5. MUEBLES (FURNITURE)
 elif mode == "Muebles":
@@ -345,11 +629,11 @@ elif mode == "Muebles":
                     "context": context_id
                 }
                 st.session_state.data['furniture'].append(new_f)
-                save_data(st.session_state.data)
+                st.session_state.dirty = True
                 st.rerun()
 
     # List
-    furn_list = get_context_data('furniture')
+    furn_list = ctx['furniture']
     wishes = [f for f in furn_list if f['status'] == 'wish']
     bought = [f for f in furn_list if f['status'] == 'bought']
 
@@ -379,7 +663,7 @@ elif mode == "Muebles":
                 # Add Bill
                 new_bill = {
                     "date": str(datetime.now().date()),
-                    "amount": real_price,
+                    "amount_cents": to_cents(real_price),
                     "category": "Muebles",
                     "description": f"Compra Mueble: {item['name']}",
                     "payer": p_payer,
@@ -395,11 +679,17 @@ elif mode == "Muebles":
                          db_item['status'] = 'bought'
                 
                 del st.session_state.temp_furn_buy
-                save_data(st.session_state.data)
+                st.session_state.dirty = True
                 st.success("¡Mueble comprado!")
                 st.rerun()
 
     if bought:
         with st.expander("Historial Comprados"):
             for item in bought:
-                st.markdown(f"✅ {item['name']}")
\ No newline at end of file
+                st.markdown(f"✅ {item['name']}")
+
+# --- DEFERRED SAVE ---
+# Sections only flag changes; the single write happens here, after rendering.
+# Since st.rerun() stops the script, this usually runs on the rerun that follows a change.
+if st.session_state.dirty:
+    save_data(st.session_state.data)